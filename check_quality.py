@@ -1,100 +1,223 @@
 import sys
+import os
+import shutil
 import subprocess
 import argparse
+import statistics
+from bisect import bisect_left
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
 from datetime import datetime
 
+from ffprobe_utils import probe
+from metric_cache import get_or_compute
+
+# PyAV + numpy compute PSNR/SSIM in-process on decoded frames, skipping
+# the ffmpeg subprocess and its filter graph. All optional: the ffmpeg
+# path below covers their absence, and VMAF always stays on ffmpeg.
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from skimage.metrics import structural_similarity
+except ImportError:
+    structural_similarity = None
+
 # ANSI color codes
-GREEN = '\033[92m'
-RED = '\033[91m'
-YELLOW = '\033[93m'
-RESET = '\033[0m'
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
 
 #Extensions
-VIDEO_EXTS = ['.mp4', '.mov', '.mkv', '.avi', ".3gp"]
+VIDEO_EXTS = frozenset({'.mp4', '.mov', '.mkv', '.avi', '.3gp'})
 
-def get_bitrate_mbps(path: Path) -> float:
-    """Get or estimate video bitrate in Mbps."""
-    # try metadata
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=bit_rate',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        str(path)
-    ]
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+# Compiled once; matched against ffmpeg's stderr for each metric pass.
+_PSNR_RE = re.compile(r'average:(\d+\.?\d*)')
+_SSIM_RE = re.compile(r'All:(0\.?\d*)')
+_VMAF_RE = re.compile(r'VMAF score: *([\d\.]+)', re.IGNORECASE)
+
+def get_bitrate_mbps(path: Path, st=None) -> float:
+    """
+    Get or estimate video bitrate in Mbps from the fused ffprobe call.
+    st takes a stat result cached by the directory scan, saving the
+    extra stat syscall on the estimate fallback.
+    """
+    info = probe(path)
+    if info["bit_rate"] is not None:
+        return info["bit_rate"] / 1e6
+    # estimate from size and duration, both already in the probe result
     try:
-        bits = float(res.stdout.strip())
-        return bits / 1e6
-    except:
-        # estimate from size and duration
-        size = path.stat().st_size
-        # get duration
-        cmd_dur = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            str(path)
-        ]
-        res_d = subprocess.run(cmd_dur, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        try:
-            dur = float(res_d.stdout.strip())
-            return (size * 8 / dur) / 1e6
-        except:
-            return 0.0
-
-def get_psnr(orig: Path, comp: Path) -> float:
-    """Run ffmpeg PSNR filter and return average PSNR value."""
+        size = info["size"]
+        if size is None:
+            size = st.st_size if st is not None else path.stat().st_size
+        return (size * 8 / info["duration"]) / 1e6
+    except (TypeError, ZeroDivisionError, OSError):
+        return 0.0
+
+def conform_chain(path: Path) -> str:
+    """
+    Builds the conform filters for one metric input, skipping the fps
+    resample and the swscale pass when the stream is already 1080p30 —
+    those are the dominant CPU cost of a metric run. Unknown streams
+    keep the full chain for safety.
+    """
+    info = probe(path)
+    parts = []
+    if info["fps"] is None or abs(info["fps"] - 30) > 0.01:
+        parts.append("fps=30")
+    if info["width"] != 1920 or info["height"] != 1080:
+        parts.append("scale=1920:1080")
+    parts.append("format=yuv420p")
+    return ",".join(parts) + ","
+
+@lru_cache(maxsize=None)
+def cuda_vmaf_available() -> bool:
+    """
+    True when an NVIDIA GPU is present and this ffmpeg build ships the
+    libvmaf_cuda filter. Checked once per run and cached.
+    """
+    if shutil.which("nvidia-smi") is None:
+        return False
+    try:
+        res = subprocess.run(["ffmpeg", "-hide_banner", "-filters"],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=False)
+    except OSError:
+        return False
+    return b"libvmaf_cuda" in res.stdout
+
+def run_vmaf_cuda(orig: Path, comp: Path):
+    """
+    Runs VMAF entirely on the GPU: NVDEC decode, scale_cuda conform and
+    libvmaf_cuda scoring, leaving the CPU free for the worker pool.
+    Returns the metrics dict, or None so the caller falls back to the
+    CPU pass when the GPU pipeline fails (e.g. unsupported codec).
+    """
     cmd = [
-        'ffmpeg', '-i', str(orig), '-i', str(comp),
-        '-lavfi', (
-            '[0:v]fps=30,scale=1920:1080,format=yuv420p[ref];'
-            '[1:v]fps=30,scale=1920:1080,format=yuv420p[dist];'
-            '[ref][dist]psnr'
-        ),
-        '-f', 'null', '-'
-    ]
-    res = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
-    # parse stderr for average PSNR
-    # looks for 'average:X' in PSNR line
-    m = re.search(r'average:(\d+\.?\d*)', res.stderr)
-    return float(m.group(1)) if m else 0.0
-
-def get_ssim(orig: Path, comp: Path) -> float:
-    """Run ffmpeg SSIM filter and return overall SSIM value."""
-    cmd = [
-        'ffmpeg', '-i', str(orig), '-i', str(comp),
-        '-lavfi', (
-            '[0:v]fps=30,scale=1920:1080,format=yuv420p[ref];'
-            '[1:v]fps=30,scale=1920:1080,format=yuv420p[dist];'
-            '[ref][dist]ssim'
-        ),
+        'ffmpeg',
+        '-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda', '-i', str(orig),
+        '-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda', '-i', str(comp),
+        '-filter_complex',
+        '[0:v]scale_cuda=1920:1080:format=yuv420p[r];'
+        '[1:v]scale_cuda=1920:1080:format=yuv420p[d];'
+        '[r][d]libvmaf_cuda',
         '-f', 'null', '-'
     ]
+    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, bufsize=1, close_fds=False)
+    score = None
+    for line in proc.stderr:
+        m = _VMAF_RE.search(line)
+        if m:
+            score = float(m.group(1))
+    if proc.wait() != 0 or score is None:
+        return None
+    return {'psnr': 0.0, 'ssim': 0.0, 'vmaf': score}
+
+def run_metrics_pyav(orig: Path, comp: Path, mode: str):
+    """
+    Computes PSNR or SSIM in-process: PyAV decodes both streams through
+    libavcodec (no subprocess, no container re-probe) and numpy scores
+    the frames. Every plane is scored, matching the ffmpeg filters'
+    definitions — PSNR over the combined Y/U/V samples, SSIM as the
+    4:1:1-weighted "All" — so results mix cleanly with the subprocess
+    path in one running average. Only used when both files share
+    resolution and fps, so no conform pass is needed. Returns the
+    metrics dict, or None when the optional deps are missing or the
+    pair can't be scored this way.
+    """
+    if av is None or np is None or mode == "vmaf":
+        return None
+    if mode == "ssim" and structural_similarity is None:
+        return None
+    i1, i2 = probe(orig), probe(comp)
+    if (i1["width"], i1["height"], i1["fps"]) != (i2["width"], i2["height"], i2["fps"]) or i1["width"] is None:
+        return None
+    # The packed yuv420p layout below needs even dimensions.
+    if i1["width"] % 2 or i1["height"] % 2:
+        return None
 
-    res = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
-    # parse stderr for 'All:0.xxx' at last SSIM line
-    m = re.search(r'All:(0\.?\d*)', res.stderr)
-    return float(m.group(1)) if m else 0.0
+    try:
+        total = 0.0
+        frames = 0
+        with av.open(str(orig)) as c1, av.open(str(comp)) as c2:
+            for f1, f2 in zip(c1.decode(video=0), c2.decode(video=0)):
+                # (h*3/2, w) array: Y plane on top, U and V packed below.
+                a = f1.to_ndarray(format="yuv420p")
+                b = f2.to_ndarray(format="yuv420p")
+                if mode == "psnr":
+                    # MSE over the whole packed array weighs each plane
+                    # by its sample count, like ffmpeg's psnr average.
+                    mse = np.mean((a.astype(np.int32) - b) ** 2)
+                    # Identical frames would divide by zero; ffmpeg's
+                    # psnr filter clips those the same way.
+                    total += 10 * np.log10(255 ** 2 / mse) if mse > 0 else 100.0
+                else:
+                    # Per-plane SSIM combined 4:1:1, like ffmpeg's All.
+                    w, h = f1.width, f1.height
+                    q = h // 4
+                    y = structural_similarity(a[:h], b[:h])
+                    u = structural_similarity(a[h:h + q].reshape(h // 2, w // 2),
+                                              b[h:h + q].reshape(h // 2, w // 2))
+                    v = structural_similarity(a[h + q:].reshape(h // 2, w // 2),
+                                              b[h + q:].reshape(h // 2, w // 2))
+                    total += (4 * y + u + v) / 6
+                frames += 1
+        if frames == 0:
+            return None
+        metrics = {'psnr': 0.0, 'ssim': 0.0, 'vmaf': 0.0}
+        metrics[mode] = total / frames
+        return metrics
+    except Exception:
+        return None
 
-def get_vmaf(orig: Path, comp: Path) -> float:
-    """Run ffmpeg libvmaf filter and return overall VMAF score."""
+def run_metrics(orig: Path, comp: Path, with_vmaf: bool = False, single_thread: bool = False) -> dict:
+    """
+    Runs one ffmpeg pass computing PSNR and SSIM (and VMAF when asked)
+    together: both inputs are decoded and conformed once, then split to
+    every metric filter, instead of re-decoding per metric.
+    single_thread pins ffmpeg to one thread so a full worker pool of
+    these doesn't oversubscribe the CPU.
+    Returns {'psnr': ..., 'ssim': ..., 'vmaf': ...} with 0.0 on misses,
+    or None when ffmpeg itself failed, so callers don't mistake (or
+    cache) a broken pass as all-zero scores.
+    """
+    n = 3 if with_vmaf else 2
+    chains = '[r1][d1]psnr;[r2][d2]ssim'
+    if with_vmaf:
+        chains += ';[r3][d3]libvmaf'
+    filt = (
+        f'[0:v]{conform_chain(orig)}split={n}' + ''.join(f'[r{i}]' for i in range(1, n + 1)) + ';'
+        f'[1:v]{conform_chain(comp)}split={n}' + ''.join(f'[d{i}]' for i in range(1, n + 1)) + ';'
+        + chains
+    )
     cmd = [
         'ffmpeg', '-i', str(orig), '-i', str(comp),
-        '-lavfi', (
-            '[0:v]fps=30,scale=1920:1080,format=yuv420p[ref];'
-            '[1:v]fps=30,scale=1920:1080,format=yuv420p[dist];'
-            '[ref][dist]libvmaf'
-        ),
+        '-lavfi', filt,
         '-f', 'null', '-'
     ]
-    res = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
-    # looks for something like "VMAF score: 95.432100"
-    m = re.search(r'(?i)VMAF score: *([\d\.]+)', res.stderr)
-    return float(m.group(1)) if m else 0.0
+    if single_thread:
+        cmd[1:1] = ['-threads', '1', '-filter_threads', '1']
+    # Streams stderr line by line instead of buffering all of it —
+    # libvmaf in particular logs per frame, O(video length) otherwise.
+    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, bufsize=1, close_fds=False)
+    metrics = {'psnr': 0.0, 'ssim': 0.0, 'vmaf': 0.0}
+    for line in proc.stderr:
+        for key, regex in (('psnr', _PSNR_RE), ('ssim', _SSIM_RE), ('vmaf', _VMAF_RE)):
+            m = regex.search(line)
+            if m:
+                # Keeps the last match; the summary lines come last.
+                metrics[key] = float(m.group(1))
+    if proc.wait() != 0:
+        return None
+    return metrics
 
 def get_args():
     parser = argparse.ArgumentParser(
@@ -122,6 +245,13 @@ def get_args():
         default="ssim",
         help="Type of test (default: ssim)"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=min(os.cpu_count() or 1, 8),
+        help="Number of videos to process in parallel (default: CPU count, capped at 8)"
+    )
 
     args = parser.parse_args()
     return args
@@ -132,6 +262,7 @@ def main():
     base_dir = Path(args.base)
     secondary_dir = Path(args.secondary)
     mode = args.mode
+    jobs = args.jobs
 
     # Checks that both directories exist.
     if not base_dir.is_dir() or not secondary_dir.is_dir():
@@ -139,8 +270,16 @@ def main():
         sys.exit(1)
 
     # Gets all videos in secondary directory, sorts and counts them.
-    videos = [f for f in secondary_dir.iterdir() if f.suffix.lower() in VIDEO_EXTS and f.is_file()]
-    videos = sorted(videos)
+    # os.scandir reuses the is_file() answer from the directory read,
+    # avoiding an extra stat syscall per entry.
+    # video_stats keeps the stat result scandir already fetched, so
+    # get_bitrate_mbps doesn't need to stat again.
+    video_stats = {}
+    with os.scandir(secondary_dir) as it:
+        for e in it:
+            if e.is_file(follow_symlinks=False) and os.path.splitext(e.name)[1].lower() in VIDEO_EXTS:
+                video_stats[Path(e.path)] = e.stat(follow_symlinks=False)
+    videos = sorted(video_stats)
     total = len(videos)
 
     # Returns if no videos were found.
@@ -151,45 +290,100 @@ def main():
     # List with each result, used to calculate average result.
     all_results = []
 
-    # Iterates base videos.
-    for idx, vid in enumerate(videos, start=1):
-        # Finds matching in secondary directory
-        print(f"[{idx}/{total}] Processing: {vid.name}")
-        matches = [f for f in base_dir.iterdir() if f.is_file() and f.stem.startswith(vid.stem)]
+    # Reads base_dir once and indexes it by stem; the per-video lookups
+    # below were re-listing the whole directory each iteration (O(N²)
+    # readdir calls). base_files stays sorted so prefix fallbacks keep
+    # picking the same first match as before.
+    with os.scandir(base_dir) as it:
+        candidates = sorted(Path(e.path) for e in it if e.is_file(follow_symlinks=False))
+    base_index = {}
+    for p in candidates:
+        base_index.setdefault(p.stem, p)
+    base_files = sorted(base_index.items())
 
-        # No matches => Continues to next video.
-        if not matches:
-            print(f'{vid.name}: No video equivalent found in base directory: {base_dir.name}')
-            continue
+    base_stems = [s for s, _ in base_files]
 
-        # Gets original video with same stem.
-        orig_video = sorted(matches)[0]
+    def find_original(stem):
+        """
+        Resolves the original for a secondary stem: exact stem hit from
+        the index, else the first base file whose stem starts with it,
+        found in O(log N) — stems sharing a prefix sort together, so
+        bisect lands on the first candidate directly.
+        """
+        orig = base_index.get(stem)
+        if orig is not None:
+            return orig
+        i = bisect_left(base_stems, stem)
+        if i < len(base_stems) and base_stems[i].startswith(stem):
+            return base_files[i][1]
+        return None
+
+    def process_video(vid):
+        """
+        Compares one secondary video against its original.
+        Returns (result_string, value), with value None when no
+        original was found.
+        """
+        orig_video = find_original(vid.stem)
+
+        # No matches => Nothing to compare against.
+        if orig_video is None:
+            return (f'{vid.name}: No video equivalent found in base directory: {base_dir.name}', None)
 
         # Original and compressed video bitrates.
         br1 = get_bitrate_mbps(orig_video)
-        br2 = get_bitrate_mbps(vid)
+        br2 = get_bitrate_mbps(vid, video_stats.get(vid))
+
+        # In-process scoring when PyAV/numpy are around and the pair
+        # needs no conforming; otherwise one fused ffmpeg pass yields
+        # every metric. Reports the one picked in the arguments.
+        def compute():
+            metrics = None
+            if mode == "vmaf" and cuda_vmaf_available():
+                metrics = run_vmaf_cuda(orig_video, vid)
+            if metrics is None:
+                metrics = run_metrics_pyav(orig_video, vid, mode)
+            if metrics is None:
+                metrics = run_metrics(orig_video, vid, with_vmaf=(mode == "vmaf"),
+                                      single_thread=(jobs > 1))
+            return metrics
 
-        # Runs test type input in the arguments.
+        # Unchanged pairs come straight from the sidecar cache, so a
+        # re-run after tuning only decodes pairs that actually changed.
+        # A failed pass still prints as zeros (the old behaviour) but
+        # is never cached, so a fixed setup re-scores the pair.
+        metrics = get_or_compute(orig_video, vid, mode, compute)
+        if metrics is None:
+            metrics = {'psnr': 0.0, 'ssim': 0.0, 'vmaf': 0.0}
+        prefix = f"{orig_video.name}: {br1:.2f} Mbps => {br2:.2f} Mbps"
         if mode == "psnr":
-            psnr = get_psnr(orig_video, vid)
-            all_results.append(psnr)
-            result = (f"{orig_video.name}: {br1:.2f} Mbps => {br2:.2f} Mbps, {GREEN}PSNR: {psnr:.2f} dB{RESET}")
+            result = (f"{prefix}, {GREEN}PSNR: {metrics['psnr']:.2f} dB{RESET}")
         elif mode == "ssim":
-            ssim = get_ssim(orig_video, vid)
-            all_results.append(ssim)
-            result = (f"{orig_video.name}: {br1:.2f} Mbps => {br2:.2f} Mbps, {GREEN}SSIM: {ssim:.4f}{RESET}")
+            result = (f"{prefix}, {GREEN}SSIM: {metrics['ssim']:.4f}{RESET}")
         else:
-            vmaf = get_vmaf(orig_video, vid)
-            all_results.append(vmaf)
-            result = (f"{orig_video.name}: {br1:.2f} Mbps => {br2:.2f} Mbps, {GREEN}VMAF: {vmaf:.4f}{RESET}")
-
-        # Testing updating avg result every iteration.
-        average_result = sum(all_results) / len(all_results)
-        decimals = 2 if mode == "psnr" else 4
-        average_result = round(average_result, decimals)
-        print(f"Result: {result}, avg: {GREEN}{average_result}{RESET}")
-    
-    average_result = sum(all_results) / len(all_results)
+            result = (f"{prefix}, {GREEN}VMAF: {metrics['vmaf']:.4f}{RESET}")
+        return (result, metrics[mode])
+
+    # Processes videos in parallel (the work lives in ffprobe/ffmpeg
+    # subprocesses); results print in order from the main thread.
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = executor.map(process_video, videos)
+        for idx, (vid, (result, value)) in enumerate(zip(videos, results), start=1):
+            print(f"[{idx}/{total}] Processing: {vid.name}")
+            if value is None:
+                print(result)
+                continue
+            all_results.append(value)
+
+            # Running average, updated as each result arrives.
+            average_result = statistics.fmean(all_results)
+            decimals = 2 if mode == "psnr" else 4
+            average_result = round(average_result, decimals)
+            print(f"Result: {result}, avg: {GREEN}{average_result}{RESET}")
+
+    # fmean is faster and numerically stabler than sum()/len() on long
+    # runs; the guard covers directories where every lookup missed.
+    average_result = statistics.fmean(all_results) if all_results else 0.0
     decimals = 2 if mode == "psnr" else 4
     average_result = round(average_result, decimals)
     print(f"Average {mode}: {average_result}.")
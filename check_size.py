@@ -1,12 +1,17 @@
 import sys
+import os
 import argparse
+import math
 from pathlib import Path
 
+from size_compare import compare_pair
+
 # ANSI color codes
-GREEN = '\033[92m'
-YELLOW = '\033[93m'
-RED = '\033[91m'
-RESET = '\033[0m'
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
 
 def format_signed(value, unit=''):
     sign = '+' if value >= 0 else '-'
@@ -17,10 +22,11 @@ def delete_files(files):
     Receives a list of videos, then iterates it and deletes them.
     Can be used to delete any files in a list, not only videos.
     """
+    # os.unlink skips pathlib's per-call Path construction; the delete
+    # syscall itself is the cheap part.
     for file_path in files:
-        path = Path(file_path)
         try:
-            path.unlink()
+            os.unlink(os.fspath(file_path))
             print(f"Deleted: {file_path}")
         except FileNotFoundError:
             print(f"Not found: {file_path}")
@@ -77,17 +83,34 @@ def main():
         sys.exit(1)
 
     # Gets all videos in secondary directory and sorts them.
-    second_dir_vids = sorted([f for f in second_dir.iterdir() if f.is_file()])
+    # os.scandir hands back the stat results with the directory read,
+    # so no per-file stat syscalls are needed later in the loop.
+    sec_sizes = {}
+    with os.scandir(second_dir) as it:
+        for e in it:
+            if e.is_file(follow_symlinks=False):
+                sec_sizes[Path(e.path)] = e.stat(follow_symlinks=False).st_size
+    second_dir_vids = sorted(sec_sizes)
     total = len(second_dir_vids)
 
+    # Indexes base_dir sizes by (stem, ext) in one sweep, replacing the
+    # three exists() probes per video with dict lookups.
+    base_sizes = {}
+    with os.scandir(base_dir) as it:
+        for e in it:
+            if e.is_file(follow_symlinks=False):
+                stem, ext = os.path.splitext(e.name)
+                base_sizes[(stem, ext.lower())] = e.stat(follow_symlinks=False).st_size
+
     # Returns if no videos were found.
     if total == 0:
         print("No videos were found")
         return
 
-    # Total size in MB of videos in both directories.
-    all_original_size = 0
-    all_coded_size = 0
+    # Per-video sizes in MB; totalled once after the loop instead of
+    # accumulating (and re-deriving percentages) per iteration.
+    orig_mbs = []
+    sec_mbs = []
 
     # List of videos to delete.
     vids_To_Delete = []
@@ -95,31 +118,23 @@ def main():
     # Iterates each video.
     for idx, vid in enumerate(second_dir_vids, start=1):
         orig_stem = vid.stem
-        orig = base_dir / (orig_stem + ".mp4")
 
-        # Checks other extension in case .mp4 is not found.
-        if not orig.exists():
-            orig = base_dir / (orig_stem + ".3gp")
-        if not orig.exists():
-            orig = base_dir / (orig_stem + ".mkv")
-
-        # Gets video size in bytes.
-        size_orig = orig.stat().st_size if orig.exists() else None
-        size_sec = vid.stat().st_size
+        # Looks up the original by stem, keeping the old extension
+        # priority, without touching the filesystem again.
+        size_orig = None
+        for ext in (".mp4", ".3gp", ".mkv"):
+            size_orig = base_sizes.get((orig_stem, ext))
+            if size_orig is not None:
+                break
+        size_sec = sec_sizes[vid]
 
         # Returns if original video wasn't found.
         if size_orig is None:
             print(f"{YELLOW}[WARN]{RESET} Original video not found.")
             continue
 
-        # Converts Bytes to Megabytes
-        mb_orig = size_orig/(1000 * 1000)
-        mb_sec = size_sec/(1000 * 1000)
-
-        # Compares both videos sizes.
-        diff_mb = mb_sec - mb_orig
-        pct = (diff_mb / mb_orig * 100) if mb_orig > 0 else 0
-        bigger_Than_Margin = pct >= margin
+        # Shared size arithmetic (MB conversion, delta, percentage).
+        mb_orig, mb_sec, diff_mb, pct, bigger_Than_Margin = compare_pair(size_orig, size_sec, margin)
 
         # Green [OK] if not bigger, else yellow [WARN].
         status = f"{GREEN}[OK]{RESET}" if not bigger_Than_Margin else f"{YELLOW}[WARN]{RESET}"
@@ -129,15 +144,17 @@ def main():
             f"[{idx}/{total}] {orig_stem} - {mb_orig:.1f} MB => {mb_sec:.1f} MB, Δ {format_signed(diff_mb, ' MB')} ({format_signed(pct, '%')}) {status}"
         )
 
-        # Adds up the size of all videos so far.
-        all_original_size += mb_orig
-        all_coded_size += mb_sec
+        # Collects the sizes for the summary totals.
+        orig_mbs.append(mb_orig)
+        sec_mbs.append(mb_sec)
 
         # Appends video to vids_To_Delete if bigger than margin.
         if bigger_Than_Margin:
             vids_To_Delete.append(vid)
 
-    # Total difference in percentage.
+    # Totals in one C-level pass; fsum keeps the MB sums exact.
+    all_original_size = math.fsum(orig_mbs)
+    all_coded_size = math.fsum(sec_mbs)
     all_diff_percentage = (all_coded_size/all_original_size-1)*100
 
     # Print summary.
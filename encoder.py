@@ -1,18 +1,41 @@
 import sys
+import os
 import subprocess
 import argparse
-import math
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from typing import Tuple, Optional, Union
 
+from ffprobe_utils import probe
+
 # ANSI color codes.
-GREEN = '\033[92m'
-RED = '\033[91m'
-YELLOW = '\033[93m'
-RESET = '\033[0m'
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
+
+# Shared spawn options: a minimal environment skips the env copy and
+# locale catalog loads on every ffprobe/ffmpeg start, and
+# close_fds=False skips the kernel's fd-table walk.
+_SUBPROC_KW = dict(
+    close_fds=False,
+    env={"LC_ALL": "C", "PATH": os.environ.get("PATH", "/usr/bin:/bin")},
+)
+
+# Matches only the progress keys the status line uses; one C-level
+# match replaces a partition plus a chain of comparisons per line.
+_PROGRESS_RE = re.compile(rb'(fps|bitrate|out_time_ms|progress)=(.*)')
+
+# Fixed command tail, shared by every invocation.
+_CMD_TAIL = ('-map_metadata', '0', '-y')
 
 # Extensions.
-VIDEO_EXTS = [".mp4", ".mkv", ".mov", ".avi", ".3gp"]
+VIDEO_EXTS = frozenset({".mp4", ".mkv", ".mov", ".avi", ".3gp"})
 
 # Recomended values.
 """
@@ -42,77 +65,21 @@ Resolution -  Pixel Count  - Description
 
 # Auxiliary Functions.
 
-def get_duration(path: Union[Path, str]) -> float:
-    """
-    Given a video path, gets its duration and returns it as a float
-    """
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        str(path)
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    try:
-        return float(result.stdout.strip())
-    except Exception:
-        return 0.0
-
 def seconds_to_mmss(seconds: Union[int, float]) -> str:
     """
     Receives a duration in seconds (possibly greater than 60) and returns it in mm:ss format.
     """
-    m = int(seconds // 60)
-    s = int(seconds % 60)
+    m, s = divmod(int(seconds), 60)
     return f"{m:02d}:{s:02d}"
 
-def get_frame_rate(path: Union[Path, str]) -> float:
-    """
-    Given a video path, gets its framerate and returns it as a float.
-    """
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=avg_frame_rate',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        str(path)
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    fr = result.stdout.strip()
-    # Either '239737/1000', '240/1' or 'N/A'.
-    try:
-        if '/' in fr:
-            num, den = fr.split('/')
-            fps_val = float(num) / float(den) if float(den) != 0 else 0.0
-        else:
-            fps_val = float(fr)
-    except Exception:
-        fps_val = 0.0
-    return fps_val
-
-def get_new_resolution(path: Union[Path, str], new_res: Union[int, str]) -> int:
+def get_new_resolution(width: int, height: int, new_res: Union[int, str]) -> int:
     """
-    Given a video path, prints its original and downscaled resolutions.
+    Given a video's dimensions, prints its original and downscaled
+    resolutions. Dimensions come from the fused probe call, so no
+    ffprobe runs here.
     """
-    # Run ffprobe to get width and height.
-    cmd = [
-        'ffprobe',
-        '-v', 'error',
-        '-show_entries', 'stream=width,height',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        str(path)
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-    if result.returncode != 0:
-        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()}")
-
-    try:
-        width_str, height_str = result.stdout.strip().split('\n')
-        width, height = int(width_str), int(height_str)
-    except ValueError:
-        raise ValueError("Could not parse resolution from ffprobe output.")
+    if width is None or height is None:
+        raise ValueError("Could not get resolution from probe output.")
 
     # Determine scale factor.
     new_res = int(new_res)
@@ -121,10 +88,10 @@ def get_new_resolution(path: Union[Path, str], new_res: Union[int, str]) -> int:
     else:
         scale_factor = new_res / height
 
-    new_width = math.floor(width * scale_factor)
-    new_height = math.floor(height * scale_factor)
-    new_width = new_width + 1 if new_width % 2 != 0 else new_width
-    new_height = new_height + 1 if new_height % 2 != 0 else new_height
+    # Rounds each dimension up to even in one branchless step; codecs
+    # reject odd sizes. (x+1)&~1 matches the old floor-then-bump result.
+    new_width = (int(width * scale_factor) + 1) & ~1
+    new_height = (int(height * scale_factor) + 1) & ~1
     print(f"[Org res] {width}x{height}")
 
     if min(width, height) > new_res:
@@ -135,50 +102,71 @@ def get_new_resolution(path: Union[Path, str], new_res: Union[int, str]) -> int:
     res = min(width, height)
     return res
 
-def get_video_audio_info(path: Path) -> Tuple[str, int]:
+@lru_cache(maxsize=None)
+def build_codec_args(library: str, crf: str, preset: str, hw: str) -> Tuple[tuple, tuple]:
+    """
+    Static part of the ffmpeg command for one (library, crf, preset, hw)
+    combination: (args before -i, codec args after it). Cached, so the
+    template is assembled once per run instead of per video.
     """
-    Returns the audio codec and bitrate (in kbps) of a video file.
-    Returns ("Undefined", 0) if no audio codec found.
+    if hw == "vaapi":
+        return (('-vaapi_device', '/dev/dri/renderD128'),
+                ('-c:v', 'hevc_vaapi', '-qp', crf))
+    if hw == "nvenc":
+        codec = 'av1_nvenc' if library == 'libsvtav1' else 'hevc_nvenc'
+        return ((), ('-c:v', codec, '-preset', 'p5', '-cq', crf))
+    if hw == "qsv":
+        return ((), ('-c:v', 'hevc_qsv', '-global_quality', crf))
+    if hw == "videotoolbox":
+        # macOS: -q:v runs 1-100 with higher = better, unlike CRF.
+        return ((), ('-c:v', 'hevc_videotoolbox', '-q:v', '55', '-tag:v', 'hvc1'))
+    return ((), ('-c:v', library, '-crf', crf, '-preset', preset))
+
+def adaptive_crf(vid: Path, crf: Union[str, int], duration: float) -> str:
     """
+    Nudges CRF by content difficulty. A 4-second 64x36 grayscale sample
+    is decoded to raw bytes and its pixel standard deviation used as a
+    cheap complexity estimate: flat content (screencasts, static shots)
+    takes +2 CRF with no visible change, busy or grainy content -2.
+    Returns the (possibly unchanged) CRF as a string.
+    """
+    cmd = ['ffmpeg', '-ss', str(max(0.0, duration / 4)), '-t', '4',
+           '-i', str(vid), '-vf', 'scale=64:36,format=gray',
+           '-f', 'rawvideo', '-']
     try:
-        # ffprobe command to extract codec name and bitrate from the audio stream.
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "a:0",
-            "-show_entries", "stream=codec_name,bit_rate",
-            "-of", "default=noprint_wrappers=1:nokey=0",
-            str(path)
-        ]
-        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-        if res.returncode != 0 or not res.stdout.strip():
-            return ("Undefined", 0)
-
-        codec_name: Optional[str] = None
-        bitrate: Optional[int] = None
-
-        for line in res.stdout.splitlines():
-            if line.startswith("codec_name="):
-                codec_name = line.split("=", 1)[1].strip()
-            elif line.startswith("bit_rate="):
-                try:
-                    bitrate = int(line.split("=", 1)[1].strip())
-                    bitrate = int(bitrate / 1000)
-                except ValueError:
-                    bitrate = None
-
-        # Normalize return types to (str, int)
-        codec_name_final = codec_name if codec_name else "Undefined"
-        bitrate_final = int(bitrate) if bitrate else 0
-        return (codec_name_final, bitrate_final)
-
-    except FileNotFoundError:
-        print("Error: ffprobe not found. Please install FFmpeg.")
-        return ("Undefined", 0)
-    except Exception as e:
-        print(f"Error reading audio info: {e}")
-        return ("Undefined", 0)
+        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **_SUBPROC_KW)
+    except Exception:
+        return str(crf)
+    buf = res.stdout
+    if res.returncode != 0 or len(buf) < 64 * 36:
+        return str(crf)
+
+    # Bytes iterate as ints, so pstdev works on the buffer directly.
+    stdev = statistics.pstdev(buf)
+    try:
+        base = int(crf)
+    except ValueError:
+        return str(crf)
+    if stdev < 30:
+        new_crf = base + 2
+    elif stdev > 70:
+        new_crf = base - 2
+    else:
+        return str(crf)
+    print(f"[CRF] {base} => {new_crf} (sample stdev {stdev:.0f})")
+    return str(new_crf)
+
+def is_complete(out_file: Path, expected_dur) -> bool:
+    """
+    True when an existing output is really finished: its probed
+    duration matches the input's within 0.5 s. A file killed mid-write
+    probes short (or not at all) and gets re-encoded, where the old
+    bare exists() check would have kept it.
+    """
+    if expected_dur is None:
+        return True  # Can't verify; behaves like the old exists() skip.
+    dur = probe(out_file)["duration"]
+    return dur is not None and abs(dur - expected_dur) < 0.5
 
 # Main Functions.
 
@@ -189,89 +177,205 @@ def encode_video(
     crf: Union[str, int],
     preset: Union[str, int],
     downscale: Union[bool, str, int],
-    audio_bitrate: Union[str, int]
-) -> None:
-    # Assigns args to variables.
-    duration = get_duration(vid)
+    audio_bitrate: Union[str, int],
+    threads: int = 0,
+    quiet: bool = False,
+    hw: str = "none",
+    extra: Optional[Tuple[str, str, str]] = None,
+    adaptive: bool = False
+) -> bool:
+    # One fused ffprobe call covers duration, fps and dimensions.
+    info = probe(vid)
+    duration = info["duration"] or 0.0
     total_mmss = seconds_to_mmss(duration)
-    input_fps = get_frame_rate(vid)
-    orig_audio_props = get_video_audio_info(vid)
-
-    # Builds ffmpeg command.
-    cmd = ['ffmpeg', '-i', str(vid), '-c:v', str(library), '-crf', str(crf), '-preset', str(preset)]
-
-    # Downscales to resolution if set.
-    if downscale:
-        res = get_new_resolution(vid, downscale)
-        vf = f"scale='if(gt(a,1),-2,{res})':'if(gt(a,1),{res},-2)',format=yuv420p" #yuv420p10le
-        cmd += ["-vf", vf]
+    progress_tail = f"/{total_mmss} - Vel: "  # Constant part of the status line.
+    input_fps = info["fps"] or 0.0
+
+    # Content-adaptive CRF: easy content gets a higher (cheaper) CRF,
+    # hard content a lower one, before the command is assembled.
+    if adaptive and hw == "none":
+        crf = adaptive_crf(vid, crf, duration)
+
+    # Builds ffmpeg command from the cached static template; hardware
+    # encoders replace the CPU codec and take their own quality flags.
+    pre, codec = build_codec_args(str(library), str(crf), str(preset), hw)
+    cmd = ['ffmpeg', *pre, '-i', str(vid), *codec]
+
+    # Downscales to resolution if set. Scaling stays in software; VAAPI
+    # additionally needs the frames uploaded to GPU memory afterwards.
+    # Inputs already at or below the target skip the filter chain (and
+    # its per-frame copy) entirely instead of running a no-op scale.
+    scale = ""
+    if downscale and not isinstance(downscale, (list, tuple)):
+        res = get_new_resolution(info["width"], info["height"], downscale)
+        if min(info["width"], info["height"]) > int(downscale):
+            scale = f"scale='if(gt(a,1),-2,{res})':'if(gt(a,1),{res},-2)'," #yuv420p10le
+    if hw == "vaapi":
+        cmd += ["-vf", scale + "format=nv12,hwupload"]
+    elif downscale and not isinstance(downscale, (list, tuple)):
+        # format=yuv420p stays even when the scale is skipped: it's
+        # what normalizes 10-bit / 4:2:2 sources to 8-bit 4:2:0.
+        cmd += ["-vf", scale + "format=yuv420p"]
 
     # Caps FPS range, since going above 240 or below 24 usually results in encoding error.
+    # Kept as a list so the extra-output/ladder paths, which rebuild the
+    # command, can re-apply the cap per output.
     if input_fps > 239:
-        cmd += ['-r', str(240)]
+        fps_args = ['-r', '240']
     elif input_fps < 24:
-        cmd += ['-r', str(24)]
+        fps_args = ['-r', '24']
+    else:
+        fps_args = []
+    cmd += fps_args
 
-    # Used to determine audio stream bitrate.
-    orig_bitrate = int(orig_audio_props[1])
-
-    # Normalize audio_bitrate to int for comparisons
-    try:
-        audio_bitrate_int = int(audio_bitrate)
-    except Exception:
-        audio_bitrate_int = 128
+    # Audio bitrate (kbps) comes from the same fused probe; files with
+    # no audio stream (or no reported rate) read as 0. The cap arrives
+    # already parsed to an int by main.
+    orig_bitrate = int((info["audio_bit_rate"] or 0) / 1000)
 
     # Caps max audio bitrate to provided max (in kbps).
-    if orig_bitrate != 0 and orig_bitrate <= audio_bitrate_int:
+    if orig_bitrate != 0 and orig_bitrate <= audio_bitrate:
         ab = f"{orig_bitrate}k"
     else:
-        ab = f"{audio_bitrate_int}k"
-    cmd += ["-c:a", "libopus", "-b:a", ab]
+        ab = f"{audio_bitrate}k"
+
+    # Copies the audio stream untouched when it already fits the output
+    # container's codec and sits under the cap — re-encoding there only
+    # burns CPU and loses a generation of quality.
+    copy_codec = "opus" if library == "libsvtav1" else "aac"
+    if info["audio_codec"] == copy_codec and 0 < orig_bitrate <= audio_bitrate:
+        cmd += ["-c:a", "copy"]
+    else:
+        cmd += ["-c:a", "libopus", "-b:a", ab]
+
+    # Pins the encoder to an equal share of the cores when several
+    # files encode at once; svt-av1 takes it via lp=, x26x via -threads.
+    # Hardware encoders run on fixed-function blocks and ignore this.
+    if threads and hw == "none":
+        if library == 'libsvtav1':
+            # pin=1 keeps each worker's threads on the cores it started
+            # on, so concurrent encodes don't migrate across each other.
+            cmd += ['-svtav1-params', f'lp={threads}:pin=1']
+        else:
+            cmd += ['-threads', str(threads)]
 
     # Copies metadata and completes command.
-    cmd += ['-map_metadata', '0',
-            '-y', '-progress', 'pipe:1', str(out_file)]
-
-    #Runs the ffmpeg command.
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    cmd += _CMD_TAIL
+    out_args = [str(out_file)]
+
+    # One decode, two encodes: --extra-output splits the decoded (and
+    # conformed) stream to a second encoder inside the same ffmpeg run,
+    # instead of demuxing and decoding the input twice.
+    if extra is not None and hw == "none":
+        lib2, crf2, preset2 = extra
+        ext2 = ".mkv" if lib2 == "libsvtav1" else ".mp4"
+        out2 = out_file.with_name(out_file.stem + "-" + lib2 + ext2)
+        cmd = ['ffmpeg', '-i', str(vid), '-y',
+               '-filter_complex', f"[0:v]{scale}format=yuv420p,split=2[v1][v2]"]
+        out_args = []
+        for label, lib_i, crf_i, preset_i, out_i in (
+                ('[v1]', str(library), str(crf), str(preset), out_file),
+                ('[v2]', lib2, crf2, preset2, out2)):
+            out_args += ['-map', label, '-map', '0:a?',
+                         '-c:v', lib_i, '-crf', crf_i, '-preset', preset_i,
+                         *fps_args,
+                         '-c:a', 'libopus', '-b:a', ab,
+                         '-map_metadata', '0', str(out_i)]
+
+    # Resolution ladder: a list of downscale targets decodes the input
+    # once and fans it out through split, one encoder per rung, instead
+    # of re-decoding per rendition.
+    if isinstance(downscale, (list, tuple)) and hw == "none":
+        n = len(downscale)
+        chains = []
+        for i, target in enumerate(downscale, start=1):
+            res = get_new_resolution(info["width"], info["height"], target)
+            chains.append(f"[s{i}]scale='if(gt(a,1),-2,{res})':'if(gt(a,1),{res},-2)',format=yuv420p[o{i}]")
+        graph = (f"[0:v]split={n}" + "".join(f"[s{i}]" for i in range(1, n + 1))
+                 + ";" + ";".join(chains))
+        cmd = ['ffmpeg', '-i', str(vid), '-y', '-filter_complex', graph]
+        out_args = []
+        for i, target in enumerate(downscale, start=1):
+            out_i = out_file.with_name(f"{out_file.stem}-{target}p{out_file.suffix}")
+            out_args += ['-map', f'[o{i}]', '-map', '0:a?',
+                         '-c:v', str(library), '-crf', str(crf), '-preset', str(preset),
+                         *fps_args,
+                         '-c:a', 'libopus', '-b:a', ab,
+                         '-map_metadata', '0', str(out_i)]
+
+    # Quiet mode (parallel encodes): no progress line, since several
+    # encoders sharing one terminal would interleave redraws.
+    if quiet:
+        cmd += out_args
+        res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **_SUBPROC_KW)
+        return res.returncode == 0
+
+    cmd += ['-progress', 'pipe:1'] + out_args
+
+    #Runs the ffmpeg command. Binary pipe: progress lines are consumed
+    # in 64K chunks with read1 and split in Python, instead of paying a
+    # readline call (and on some platforms a syscall) per line.
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **_SUBPROC_KW)
     last_line_length = 0
+    last_print = 0.0
+    last_sec = -1
+    mmss = "00:00"
     fps = 0
     bitrate = "0kbits/s"
+    # Locals for the hot loop: attribute lookups per progress event add
+    # up over thousands of events.
+    _write = sys.stdout.write
+    _flush = sys.stdout.flush
     try:
-        while True:
-            line = proc.stdout.readline()
-            if not line:
+        buf = bytearray()
+        running = True
+        while running:
+            chunk = proc.stdout.read1(65536)
+            if not chunk:
                 break
-            line = line.strip()
-            if '=' not in line:
-                continue
-            key, val = line.split('=', 1)
-
-            if key == 'fps':
-                try:
-                    fps = round(float(val), 1)
-                except:
-                    fps = 0
-            elif key == 'bitrate':
-                try:
-                    bitrate = val
-                except:
-                    bitrate = 0
-            elif key == 'out_time_ms':
-                try:
-                    current_time_ms = int(val)
-                except ValueError:
+            buf += chunk
+            lines = buf.split(b'\n')
+            buf = bytearray(lines.pop())  # Keeps any partial last line.
+            for raw in lines:
+                m = _PROGRESS_RE.match(raw)
+                if m is None:
                     continue
-                completed_sec = current_time_ms / 1_000_000
-                pct = (completed_sec / duration) * 100 if duration else 0
-                pct = min(pct, 100)
-                mmss = seconds_to_mmss(completed_sec)
-                msg = f"[{pct:.0f}%] {mmss}/{total_mmss} - Vel: {fps} FPS"
-                msg = f"[{pct:.0f}%] {mmss}/{total_mmss} - Vel: {fps} FPS - BR: {bitrate}"
-                print('\r' + msg + ' ' * max(0, last_line_length - len(msg)), end='', flush=True)
-                last_line_length = len(msg)
-            elif key == 'progress' and val == 'end':
-                break
+                key, val = m.group(1), m.group(2).strip()
+
+                if key == b'fps':
+                    try:
+                        fps = round(float(val), 1)
+                    except:
+                        fps = 0
+                elif key == b'bitrate':
+                    bitrate = val.decode('ascii', 'replace')
+                elif key == b'out_time_ms':
+                    try:
+                        current_time_ms = int(val)
+                    except ValueError:
+                        continue
+                    # Throttles redraws to ~4 Hz; ffmpeg reports progress
+                    # more often and each redraw is a write syscall.
+                    now = time.monotonic()
+                    if now - last_print < 0.25:
+                        continue
+                    last_print = now
+                    completed_sec = current_time_ms / 1_000_000
+                    pct = (completed_sec / duration) * 100 if duration else 0
+                    pct = min(pct, 100)
+                    # mm:ss only changes once per second; reformatting
+                    # it on every event would be wasted work.
+                    sec = int(completed_sec)
+                    if sec != last_sec:
+                        last_sec = sec
+                        mmss = seconds_to_mmss(sec)
+                    msg = f"[{pct:.0f}%] {mmss}{progress_tail}{fps} FPS - BR: {bitrate}"
+                    _write('\r' + msg + ' ' * max(0, last_line_length - len(msg)))
+                    _flush()
+                    last_line_length = len(msg)
+                elif key == b'progress' and val == b'end':
+                    running = False
+                    break
 
         proc.wait()
         print(f"\r[100%] {total_mmss}/{total_mmss} - Vel: {fps} FPS - BR: {bitrate}")
@@ -280,10 +384,25 @@ def encode_video(
             print(f"{GREEN}[OK]{RESET}\n")
         else:
             raise subprocess.CalledProcessError(proc.returncode, cmd)
+        return True
 
     except Exception as e:
         print(f"{RED}[ERROR]{RESET}")
-        print(e + "\n")
+        print(f"{e}\n")
+        return False
+
+def write_summary(output_dir: Path, lines: list) -> None:
+    """
+    Appends the run's per-video results to the log in a single buffered
+    write, rather than an open/write/close triple per video.
+    """
+    if not lines:
+        return
+    try:
+        with open(output_dir / "encode_log.txt", "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+    except OSError as e:
+        print(f"Couldn't write encode log: {e}")
 
 def get_args():
     parser = argparse.ArgumentParser(
@@ -319,9 +438,8 @@ def get_args():
     parser.add_argument(
         "-d",
         "--downscale",
-        choices=["180", "360", "540", "720", "900", "1080", "1440", "2160"],
         default="2160",
-        help="Downscale to specific resolution (default: 2160)"
+        help="Target resolution, or a comma list for a multi-resolution ladder (e.g. 1080,720,540) (default: 2160)"
     )
     parser.add_argument(
         "-a",
@@ -330,6 +448,46 @@ def get_args():
         default="128",
         help="Set max audio bitrate (default: 128)"
     )
+    parser.add_argument(
+        "--extra-output",
+        dest="extra_output",
+        default=None,
+        help="Second encode of each input in the same pass, as library:crf:preset (e.g. libx265:24:medium)"
+    )
+    parser.add_argument(
+        "--adaptive-crf",
+        dest="adaptive_crf",
+        choices=["true", "false"],
+        default="false",
+        help="Adjust CRF per video from a quick content-complexity sample (default: false)"
+    )
+    parser.add_argument(
+        "--hw",
+        choices=["none", "vaapi", "nvenc", "qsv", "videotoolbox"],
+        default="none",
+        help="Hardware encoder to use instead of the CPU library (default: none)"
+    )
+    parser.add_argument(
+        "--enc-threads",
+        dest="enc_threads",
+        type=int,
+        default=0,
+        help="Encoder thread count per ffmpeg run; 0 lets the codec decide (default: 0)"
+    )
+    parser.add_argument(
+        "--ccd",
+        type=int,
+        choices=[0, 1, 2],
+        default=2,
+        help="Pin work to one CPU die: 0 = first half of cores, 1 = second half, 2 = no pinning (default: 2)"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of videos to encode in parallel (default: 1)"
+    )
     parser.add_argument(
         "-r",
         "--reverse",
@@ -348,17 +506,79 @@ def main():
     crf = args.crf
     preset = args.preset
     audio_bitrate = args.audiobitrate
+    audio_cap = int(audio_bitrate)  # Parsed once; choices guarantee digits.
     extension = ".mkv" if library == "libsvtav1" else ".mp4"
     downscale = False if args.downscale == "false" else args.downscale
     reverse_Order = False if args.reverse == "false" else True
 
+    # A comma list of targets becomes a ladder: encode_video fans the
+    # decoded stream out to one encoder per resolution.
+    ladder = None
+    valid_res = {"180", "360", "540", "720", "900", "1080", "1440", "2160"}
+    if downscale:
+        targets = [t.strip() for t in str(downscale).split(",") if t.strip()]
+        if any(t not in valid_res for t in targets):
+            print(f"--downscale takes resolutions from {sorted(valid_res, key=int)}")
+            sys.exit(1)
+        if len(targets) > 1:
+            ladder = targets
+            downscale = targets
+        else:
+            downscale = targets[0]
+    jobs = max(1, args.jobs)
+    enc_threads = max(0, args.enc_threads)
+    hw = args.hw
+    adaptive = args.adaptive_crf == "true"
+
+    # Pins this process to one half of the cores (one CCD on dual-die
+    # Ryzen parts, keeping svt-av1/x265 inside a single L3). Children
+    # inherit the mask, so every ffmpeg spawn is covered. Linux only.
+    if args.ccd in (0, 1) and hasattr(os, "sched_setaffinity"):
+        n_cores = os.cpu_count() or 1
+        half = max(1, n_cores // 2)
+        mask = set(range(half)) if args.ccd == 0 else set(range(half, n_cores))
+        try:
+            os.sched_setaffinity(0, mask)
+        except OSError as e:
+            print(f"{YELLOW}[WARN]{RESET} Couldn't set CPU affinity: {e}")
+
+    # Parses --extra-output into (library, crf, preset).
+    extra = None
+    if args.extra_output:
+        parts = args.extra_output.split(":")
+        if len(parts) != 3:
+            print("--extra-output must be library:crf:preset")
+            sys.exit(1)
+        extra = tuple(parts)
+
+    # Both features rebuild the output half of the ffmpeg command, so
+    # they can't combine in one run.
+    if extra is not None and ladder is not None:
+        print("--extra-output can't be combined with a --downscale ladder")
+        sys.exit(1)
+
+    # The ladder graph only drives the CPU encoders; refusing beats
+    # silently emitting one unscaled output.
+    if ladder is not None and hw != "none":
+        print("A --downscale ladder requires the CPU encoders (--hw none)")
+        sys.exit(1)
+
+    # Same for the second encode: it only exists on the CPU path.
+    if extra is not None and hw != "none":
+        print("--extra-output requires the CPU encoders (--hw none)")
+        sys.exit(1)
+
     # Checks if input directory exists.
     if not base_dir.is_dir():
         print("Directory does not exist")
         sys.exit(1)
 
     # Selects all videos in input directory, sorts them and counts them.
-    videos = [f for f in base_dir.iterdir() if f.suffix.lower() in VIDEO_EXTS and f.is_file()]
+    # os.scandir reuses the is_file() answer from the directory read,
+    # avoiding an extra stat syscall per entry.
+    with os.scandir(base_dir) as it:
+        videos = [Path(e.path) for e in it
+                  if e.is_file(follow_symlinks=False) and os.path.splitext(e.name)[1].lower() in VIDEO_EXTS]
     videos = sorted(videos, reverse=reverse_Order)
     total = len(videos)
 
@@ -368,21 +588,84 @@ def main():
         return
     
     # Creates output folder with arguments data.
-    output_dir = base_dir / (library + "-" + crf + "-" + preset + "-" + downscale + "p-" + audio_bitrate + "k")
+    output_dir = base_dir / (library + "-" + crf + "-" + preset + "-" + str(args.downscale).replace(",", "-") + "p-" + audio_bitrate + "k")
     output_dir.mkdir(exist_ok=True)
 
+    # One listdir covers every skip check below; exists() would stat
+    # once per input on every resume run.
+    existing = set(os.listdir(output_dir))
+
+    # Warms the probe cache for every input in one concurrent burst.
+    # ffprobe waits release the GIL, so the processes overlap; the skip
+    # checks and encode_video then resolve probe() from memory.
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as ex:
+        for _ in ex.map(probe, videos):
+            pass
+
+    # Per-video result lines, written to the log in one shot at the end
+    # instead of reopening the file per video.
+    summary = []
+
+    # Parallel mode: encodes several videos at once, each pinned to an
+    # equal share of the cores. Codec thread efficiency is sublinear,
+    # so K encoders with cores/K threads beat one encoder with all of
+    # them on directories of many clips.
+    if jobs > 1:
+        threads = enc_threads or max(1, (os.cpu_count() or 1) // jobs)
+        futures = {}
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for vid in videos:
+                out_file = output_dir / (vid.stem + extension)
+                # Ladder runs name outputs per rung; the first rung
+                # stands in for the resume check.
+                check = out_file if ladder is None else out_file.with_name(f"{out_file.stem}-{ladder[0]}p{out_file.suffix}")
+                if check.name in existing and is_complete(check, probe(vid)["duration"]):
+                    print(f"{YELLOW}[Skipping]{RESET} {vid.name}")
+                    continue
+                fut = executor.submit(encode_video, vid, out_file, library, crf,
+                                      preset, downscale, audio_cap, threads, True, hw, extra,
+                                      adaptive)
+                futures[fut] = vid
+            for done, fut in enumerate(as_completed(futures), start=1):
+                vid = futures[fut]
+                ok = fut.result()
+                status = f"{GREEN}[OK]{RESET}" if ok else f"{RED}[ERROR]{RESET}"
+                print(f"[{done}/{len(futures)}] {vid.name} {status}")
+                summary.append(f"{vid.name}: {'OK' if ok else 'ERROR'}")
+        write_summary(output_dir, summary)
+        return
+
+    # Probes one file ahead on a helper thread, hiding ffprobe latency
+    # behind the running encode. probe() results are lru-cached, so the
+    # later calls for the same file resolve from memory.
+    prefetch = ThreadPoolExecutor(max_workers=1)
+    next_probe = prefetch.submit(probe, videos[0])
+
     # Iterates each video.
     for idx, vid in enumerate(videos, start=1):
         print(f"[{idx}/{total}] Processing: {vid.name}")
 
+        info = next_probe.result()
+        if idx < total:
+            next_probe = prefetch.submit(probe, videos[idx])
+
         out_file = output_dir / (vid.stem + extension) # Output video name.
 
-        # Skips if video already exists.
-        if out_file.exists():
+        # Skips if a finished output already exists; partial files from
+        # an interrupted run fail the duration check and re-encode.
+        # Ladder runs name outputs per rung, so the first rung stands
+        # in for the check.
+        check = out_file if ladder is None else out_file.with_name(f"{out_file.stem}-{ladder[0]}p{out_file.suffix}")
+        if check.name in existing and is_complete(check, info["duration"]):
             print(f"{YELLOW}[Skipping]{RESET}")
             continue
 
-        encode_video(vid, out_file, library, crf, preset, downscale, audio_bitrate)
+        ok = encode_video(vid, out_file, library, crf, preset, downscale, audio_cap,
+                          threads=enc_threads, hw=hw, extra=extra, adaptive=adaptive)
+        summary.append(f"{vid.name}: {'OK' if ok else 'ERROR'}")
+
+    prefetch.shutdown()
+    write_summary(output_dir, summary)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
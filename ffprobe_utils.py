@@ -0,0 +1,143 @@
+import atexit
+import json
+import os
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+
+# Cache location, shared with the other on-disk caches. Entries are
+# keyed by abspath:size:mtime_ns, so they invalidate when the file
+# changes and hit regardless of the invoking directory.
+CACHE_DIR = Path.home() / ".cache" / "backup-tools"
+CACHE_FILE = CACHE_DIR / "ffprobe_cache.json"
+
+_disk_cache = None
+_cache_dirty = False
+
+def _load_disk_cache():
+    global _disk_cache
+    if _disk_cache is None:
+        try:
+            _disk_cache = json.loads(CACHE_FILE.read_text())
+        except (OSError, ValueError):
+            _disk_cache = {}
+    return _disk_cache
+
+def _save_disk_cache():
+    if _cache_dirty and _disk_cache:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_FILE.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(_disk_cache))
+            os.replace(tmp, CACHE_FILE)
+        except OSError:
+            pass
+
+atexit.register(_save_disk_cache)
+
+def _probe(path):
+    """
+    Runs a single ffprobe over path and returns the fields the scripts
+    care about in one dict: duration (s), video bit_rate (bps), size
+    (bytes), creation_time, dimensions, fps, and the first audio
+    stream's codec and bit rate. Missing fields come back as None, so
+    callers keep their own fallbacks.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,bit_rate,width,height,avg_frame_rate:format=duration,size:format_tags=creation_time",
+        "-of", "json",
+        str(path)
+    ]
+    # close_fds=False keeps the posix_spawn fast path free of the
+    # per-spawn fd-table walk; ffprobe inherits nothing it can misuse.
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=False)
+
+    info = {
+        "duration": None, "bit_rate": None, "size": None,
+        "creation_time": None, "width": None, "height": None, "fps": None,
+        "audio_codec": None, "audio_bit_rate": None,
+    }
+    if result.returncode != 0:
+        return info
+
+    try:
+        data = json.loads(result.stdout)
+    except (ValueError, TypeError):
+        return info
+
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+
+    try:
+        info["duration"] = float(fmt["duration"])
+    except (KeyError, ValueError):
+        pass
+    try:
+        info["size"] = int(fmt["size"])
+    except (KeyError, ValueError):
+        pass
+    info["creation_time"] = fmt.get("tags", {}).get("creation_time")
+
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    if video is not None:
+        try:
+            info["bit_rate"] = float(video["bit_rate"])
+        except (KeyError, ValueError):
+            pass
+        info["width"] = video.get("width")
+        info["height"] = video.get("height")
+        # avg_frame_rate comes back as e.g. '30000/1001' or 'N/A'.
+        try:
+            num, _, den = video.get("avg_frame_rate", "").partition("/")
+            info["fps"] = float(num) / float(den) if den else float(num)
+        except (ValueError, ZeroDivisionError):
+            pass
+
+    if audio is not None:
+        info["audio_codec"] = audio.get("codec_name")
+        try:
+            info["audio_bit_rate"] = float(audio["bit_rate"])
+        except (KeyError, ValueError):
+            pass
+
+    return info
+
+@lru_cache(maxsize=4096)
+def _probe_cached(path_str, size, mtime_ns):
+    """
+    In-memory cache over _probe, keyed by (path, size, mtime_ns) so the
+    same file probed twice in one run costs one subprocess. Backed by
+    the on-disk sidecar for cross-run reuse.
+    """
+    global _cache_dirty
+    # The trailing version invalidates sidecar entries written before
+    # the probe grew its audio fields.
+    key = f"{path_str}:{size}:{mtime_ns}:a1"
+    disk = _load_disk_cache()
+    if key in disk:
+        return disk[key]
+
+    info = _probe(path_str)
+    # Only successful probes persist; a transient failure (I/O hiccup,
+    # locked file) must be retried next run, not remembered for the
+    # life of this (path, size, mtime). Same rule as the sqlite
+    # duration cache.
+    if info["duration"] is not None:
+        disk[key] = info
+        _cache_dirty = True
+    return info
+
+def probe(path):
+    """
+    Cached front-end to the fused ffprobe call. Falls back to an
+    uncached probe when the file can't be stat'ed.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _probe(path)
+    return _probe_cached(os.path.abspath(path), st.st_size, st.st_mtime_ns)
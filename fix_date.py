@@ -5,60 +5,126 @@ import argparse
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
-# ANSI color codes.
-GREEN = '\033[92m'
-YELLOW = '\033[93m'
-RED = '\033[91m'
-RESET = '\033[0m'
+from ffprobe_utils import probe
+from time_utils import parse_ts, parse_ffprobe_utc
 
-# Extensions to process.
-IMAGE_EXTS = [".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".png"]
-VIDEO_EXTS = [".mp4", ".mov", ".mkv", ".avi", ".3gp"]
+# ANSI color codes.
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
+
+# Extensions to process. Frozensets make the suffix checks O(1).
+IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".png"})
+VIDEO_EXTS = frozenset({".mp4", ".mov", ".mkv", ".avi", ".3gp"})
+ALL_EXTS = IMAGE_EXTS | VIDEO_EXTS
+
+# Shared spawn options: close_fds=False skips the kernel's fd-table
+# walk on Linux, and the minimal C-locale env keeps exiftool/ffmpeg
+# from loading locale catalogs on every start.
+_SUBPROC_KW = dict(
+    close_fds=False,
+    env={"LC_ALL": "C", "PATH": os.environ.get("PATH", "")},
+)
 
 # Auxiliary Functions.
 
-def get_image_datetime(path: Path):
+class ExifToolDaemon:
+    """
+    Keeps a single exiftool process alive with -stay_open, so each
+    command is a pipe write instead of a full Perl interpreter startup
+    (~200-400 ms per spawn). Use as a context manager; run() returns
+    exiftool's stdout for one batch of arguments.
+    """
+
+    def __enter__(self):
+        try:
+            self.proc = subprocess.Popen(
+                ["exiftool", "-stay_open", "True", "-@", "-"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                **_SUBPROC_KW
+            )
+        except Exception:
+            # exiftool missing: callers fall back to one-shot spawns.
+            self.proc = None
+        return self
+
+    def run(self, args):
+        """
+        Sends one argument set terminated by -execute and reads the
+        response until exiftool prints {ready}. Returns the output, or
+        None when the daemon isn't running.
+        """
+        if self.proc is None or self.proc.poll() is not None:
+            return None
+        for arg in args:
+            self.proc.stdin.write(str(arg) + "\n")
+        self.proc.stdin.write("-execute\n")
+        self.proc.stdin.flush()
+
+        lines = []
+        while True:
+            line = self.proc.stdout.readline()
+            if not line or line.strip() == "{ready}":
+                break
+            lines.append(line)
+        return "".join(lines)
+
+    def __exit__(self, exc_type, exc, tb):
+        # Asks exiftool to shut down cleanly so no zombie is left behind.
+        if self.proc is not None:
+            try:
+                self.proc.stdin.write("-stay_open\nFalse\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=5)
+            except Exception:
+                self.proc.kill()
+
+def get_image_datetime(path: Path, et=None):
     """
     Gets DateTimeOriginal of image using exiftool, then returns it in YYYYMMDD_HHMMSS format.
+    Uses the stay_open daemon when one is passed, else a one-shot spawn.
     """
-    cmd = [
-        "exiftool",
+    args = [
+        "-fast2",   # Stop at the EXIF header; skips MakerNotes/trailer scans.
         "-DateTimeOriginal",
         "-d", "%Y%m%d_%H%M%S",
         "-S", "-s",
         str(path)
     ]
+    out = None
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
-        out = proc.stdout.strip()
+        if et is not None:
+            out = et.run(args)
+        if out is None:
+            proc = subprocess.run(["exiftool"] + args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, **_SUBPROC_KW)
+            out = proc.stdout
+        out = out.strip()
     except:
         pass
     return out or None
 
 def get_video_datetime(path: Path):
     """
-    Extracts creation_time from a video using ffprobe and converts it from UTC to CDMX time (UTC-6).
+    Extracts creation_time from a video via the fused ffprobe call and
+    converts it from UTC to CDMX time (UTC-6).
     Returns the result in the format YYYYMMDD_HHMMSS.
     """
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "format_tags=creation_time",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(path)
-    ]
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
-    ts = proc.stdout.strip()
+    ts = probe(path)["creation_time"]
     if not ts:
         return None
 
-    try:
-        # Example ffprobe timestamp: 2024-10-18T21:52:16.000000Z
-        dt_utc = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
-        dt_cdmx = dt_utc.astimezone(timezone(timedelta(hours=-6)))
-        return dt_cdmx.strftime("%Y%m%d_%H%M%S")
-    except ValueError:
+    # Example ffprobe timestamp: 2024-10-18T21:52:16.000000Z
+    dt_utc = parse_ffprobe_utc(ts)
+    if dt_utc is None:
         return None
+    dt_utc = dt_utc.replace(tzinfo=timezone.utc)
+    dt_cdmx = dt_utc.astimezone(timezone(timedelta(hours=-6)))
+    return dt_cdmx.strftime("%Y%m%d_%H%M%S")
 
 def is_within_margin(filename_ts: str, metadata_ts: str, max_seconds: int) -> bool:
     """
@@ -66,9 +132,8 @@ def is_within_margin(filename_ts: str, metadata_ts: str, max_seconds: int) -> bo
     Returns True if within margin, else False
     """
     # String to datetime.
-    fmt = "%Y%m%d_%H%M%S"
-    dt_file = datetime.strptime(filename_ts, fmt)
-    dt_meta = datetime.strptime(metadata_ts, fmt)
+    dt_file = parse_ts(filename_ts)
+    dt_meta = parse_ts(metadata_ts)
     
     # Calculates absolute difference.
     delta = abs(dt_file - dt_meta)
@@ -90,7 +155,7 @@ def set_file_modification_date(path: Path, local_ts: str) -> bool:
     """
     try:
         # Parse timestamp
-        dt = datetime.strptime(local_ts, "%Y%m%d_%H%M%S")
+        dt = parse_ts(local_ts)
         ts = dt.timestamp()  # convert to Unix timestamp
 
         # Update access and modification times
@@ -108,7 +173,7 @@ def set_video_date(path: Path, local_ts: str) -> bool:
 
     # Parses local timestamp.
     try:
-        dt_local = datetime.strptime(local_ts, "%Y%m%d_%H%M%S")
+        dt_local = parse_ts(local_ts)
     except ValueError:
         raise ValueError(f"Timestamp {local_ts!r} not in YYYYMMDD_HHMMSS")
     
@@ -130,7 +195,7 @@ def set_video_date(path: Path, local_ts: str) -> bool:
         "-metadata", f"creation_time={utc_str}",
         str(tmp_path)
     ]
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **_SUBPROC_KW)
     if res.returncode != 0 or not tmp_path.exists():
         if tmp_path.exists():
             tmp_path.unlink()
@@ -138,29 +203,42 @@ def set_video_date(path: Path, local_ts: str) -> bool:
     
     # Atomically replaces original
     os.replace(str(tmp_path), str(path))
+
+    # The remux just pushed the whole file through the page cache; drop
+    # those pages so they don't evict metadata the outer scan is using.
+    if hasattr(os, "posix_fadvise"):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
     set_file_modification_date(path, local_ts)
     return True
 
-def set_image_date(path: Path, local_ts: str) -> bool:
+def set_image_date(path: Path, local_ts: str, et=None) -> bool:
     """
     Sets all the important EXIF date tags of an image (CreateDate, DateTimeOriginal, ModifyDate)
     to `local_ts` (CDMX local time).
+    Uses the stay_open daemon when one is passed, else a one-shot spawn.
 
     Returns:
         True if ExifTool succeed, False otherwise.
     """
     # Parses incoming timestamp
     try:
-        dt = datetime.strptime(local_ts, "%Y%m%d_%H%M%S")
+        dt = parse_ts(local_ts)
     except ValueError:
         raise ValueError(f"Timestamp {local_ts!r} not in YYYYMMDD_HHMMSS format")
 
     # Reformats to EXIF’s "YYYY:MM:DD HH:MM:SS"
     exif_ts = dt.strftime("%Y:%m:%d %H:%M:%S")
 
-    # Builds ExifTool command
-    cmd = [
-        "exiftool",
+    # Builds ExifTool arguments
+    args = [
         "-overwrite_original",
         f"-AllDates={exif_ts}",
         "Time-OffsetTimeOriginal=-06:00 -OffsetTimeDigitized=-06:00 -OffsetTime=-06:00" # Offsets UTC to match CDMX time.
@@ -169,9 +247,14 @@ def set_image_date(path: Path, local_ts: str) -> bool:
     ]
 
     # Runs ExifTool.
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    ok = False
+    if et is not None and et.run(args) is not None:
+        ok = True
+    else:
+        res = subprocess.run(["exiftool"] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **_SUBPROC_KW)
+        ok = res.returncode == 0
     set_file_modification_date(path, local_ts)
-    return res.returncode == 0
+    return ok
 
 def get_args():
     parser = argparse.ArgumentParser(
@@ -228,8 +311,13 @@ def main():
         print(f"Input directory doesn't exist.")
         sys.exit(1)
     
-    # Sorts photos and videos by name.
-    files = sorted([f for f in base_dir.iterdir() if f.suffix.lower() in IMAGE_EXTS + VIDEO_EXTS])
+    # Sorts photos and videos by name. os.scandir reuses the file-type
+    # answer from the directory read, avoiding a stat per entry.
+    with os.scandir(base_dir) as it:
+        files = sorted(
+            Path(e.path) for e in it
+            if e.is_file(follow_symlinks=False) and os.path.splitext(e.name)[1].lower() in ALL_EXTS
+        )
     total = len(files)
 
     # Checks if there are compatible files in dir.
@@ -238,55 +326,57 @@ def main():
         return
 
     # Iterates each file and display total files count.
-    for idx, item in enumerate(files, start=1):
-
-        # Print current index, total files and current file name.
-        print(f"[{idx}/{total}] {item.name}")
-
-        # Extracts date from name and metadata in YYYYMMDD_HHMMSS format.
-        name_date = item.stem[:15]
-        meta_date = get_image_datetime(item) if item.suffix.lower() in IMAGE_EXTS else get_video_datetime(item)
-
-        # Checks if there is a mismatch between name and metadata dates.
-        try:
-            is_OK = is_within_margin(name_date, meta_date, max_seconds)
-        except:
-            is_OK = (False, 0)
-
-        # Case 1: No metadata at all => Appends name date.
-        if not meta_date:
-            print(f"{YELLOW}[WARN]{RESET} No metadata was found")
-            if fix or overwrite:
-                print(f"Fixing... {item} => {name_date}")
-                if item.suffix.lower() in IMAGE_EXTS:
-                    set_image_date(item, name_date)
-                else:
-                    set_video_date(item, name_date)
-            continue
-
-        # Used to avoid overwriting a file that already exists.
-        pathUniqueDates.append(name_date)
-
-        # Case 1: Dates differ => Keeps only selected date.
-        if not is_OK[0] or overwrite:
-            print(f"{RED}[ERROR]{RESET} Metadata differs. NAME: {name_date}, META: {meta_date}. Diff => {is_OK[1]} [{item.suffix}]")
-            if fix or overwrite:
-                print(f"Fixing... {item.name}")
-                # Image fix.
-                if item.suffix.lower() in IMAGE_EXTS:
-                    if date_to_keep == "name":
-                        set_image_date(item, name_date) # Appends date in name.
-                    elif meta_date not in pathUniqueDates and meta_date not in metaUniqueDates: # Avoid overwriting any files.
-                        metaUniqueDates.append(meta_date) # Appends name to list with names already in use.
-                        set_image_date(item, meta_date) # Renames file with date in metadata.
+    # A single exiftool daemon serves every image read/write in the loop.
+    with ExifToolDaemon() as et:
+        for idx, item in enumerate(files, start=1):
+
+            # Print current index, total files and current file name.
+            print(f"[{idx}/{total}] {item.name}")
+
+            # Extracts date from name and metadata in YYYYMMDD_HHMMSS format.
+            name_date = item.stem[:15]
+            meta_date = get_image_datetime(item, et) if item.suffix.lower() in IMAGE_EXTS else get_video_datetime(item)
+
+            # Checks if there is a mismatch between name and metadata dates.
+            try:
+                is_OK = is_within_margin(name_date, meta_date, max_seconds)
+            except:
+                is_OK = (False, 0)
+
+            # Case 1: No metadata at all => Appends name date.
+            if not meta_date:
+                print(f"{YELLOW}[WARN]{RESET} No metadata was found")
+                if fix or overwrite:
+                    print(f"Fixing... {item} => {name_date}")
+                    if item.suffix.lower() in IMAGE_EXTS:
+                        set_image_date(item, name_date, et)
                     else:
-                        print(f"There is a file with the same name: {meta_date}")
-                # Video fix.
-                else:
-                    if date_to_keep == "name":
                         set_video_date(item, name_date)
-                    elif meta_date not in pathUniqueDates and meta_date not in metaUniqueDates:
-                        set_video_date(item, meta_date)
+                continue
+
+            # Used to avoid overwriting a file that already exists.
+            pathUniqueDates.append(name_date)
+
+            # Case 1: Dates differ => Keeps only selected date.
+            if not is_OK[0] or overwrite:
+                print(f"{RED}[ERROR]{RESET} Metadata differs. NAME: {name_date}, META: {meta_date}. Diff => {is_OK[1]} [{item.suffix}]")
+                if fix or overwrite:
+                    print(f"Fixing... {item.name}")
+                    # Image fix.
+                    if item.suffix.lower() in IMAGE_EXTS:
+                        if date_to_keep == "name":
+                            set_image_date(item, name_date, et) # Appends date in name.
+                        elif meta_date not in pathUniqueDates and meta_date not in metaUniqueDates: # Avoid overwriting any files.
+                            metaUniqueDates.append(meta_date) # Appends name to list with names already in use.
+                            set_image_date(item, meta_date, et) # Renames file with date in metadata.
+                        else:
+                            print(f"There is a file with the same name: {meta_date}")
+                    # Video fix.
+                    else:
+                        if date_to_keep == "name":
+                            set_video_date(item, name_date)
+                        elif meta_date not in pathUniqueDates and meta_date not in metaUniqueDates:
+                            set_video_date(item, meta_date)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
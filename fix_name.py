@@ -5,14 +5,16 @@ import argparse
 from pathlib import Path
 
 # ANSI color codes.
-GREEN = '\033[92m'
-YELLOW = '\033[93m'
-RED = '\033[91m'
-RESET = '\033[0m'
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
 
 # Extensions to process.
-IMAGE_EXTS = [".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".png"]
-VIDEO_EXTS = [".mp4", ".mov", ".mkv", ".avi", ".3gp"]
+IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".png"})
+VIDEO_EXTS = frozenset({".mp4", ".mov", ".mkv", ".avi", ".3gp"})
+ALL_EXTS = IMAGE_EXTS | VIDEO_EXTS
 
 def standardize_filename(path: Path, keep_app_name: bool = False) -> Path:
     """
@@ -84,7 +86,7 @@ def main():
         sys.exit(1)
 
     # Sorts photos and videos by name.
-    files = sorted([f for f in base_dir.iterdir() if f.suffix.lower() in IMAGE_EXTS + VIDEO_EXTS])
+    files = sorted([f for f in base_dir.iterdir() if f.suffix.lower() in ALL_EXTS])
     total = len(files)
 
     # Checks if there are compatible files in dir.
@@ -0,0 +1,62 @@
+import atexit
+import json
+import os
+from pathlib import Path
+
+# Cache location, shared with the other on-disk caches. Entries are
+# keyed by the absolute paths and (size, mtime_ns) of both files plus
+# the metric mode, so re-running a tuning session only pays for pairs
+# that changed, from whichever directory it's launched.
+CACHE_DIR = Path.home() / ".cache" / "backup-tools"
+CACHE_FILE = CACHE_DIR / "metrics.json"
+
+_cache = None
+_dirty = False
+
+def _load():
+    global _cache
+    if _cache is None:
+        try:
+            _cache = json.loads(CACHE_FILE.read_text())
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+def _save():
+    if _dirty and _cache:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_FILE.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(_cache))
+            os.replace(tmp, CACHE_FILE)
+        except OSError:
+            pass
+
+atexit.register(_save)
+
+def get_or_compute(orig, comp, mode, compute_fn):
+    """
+    Returns the cached metrics dict for the (orig, comp, mode) pair, or
+    runs compute_fn() and caches its result. Stat failures skip the
+    cache entirely, so compute_fn keeps its own error behaviour, and a
+    None result (failed pass) is returned without being stored — one
+    bad run must not pin zero scores to the pair forever.
+    """
+    global _dirty
+    try:
+        so = os.stat(orig)
+        sc = os.stat(comp)
+    except OSError:
+        return compute_fn()
+
+    key = (f"{os.path.abspath(orig)}:{so.st_size}:{so.st_mtime_ns}:"
+           f"{os.path.abspath(comp)}:{sc.st_size}:{sc.st_mtime_ns}:{mode}")
+    cache = _load()
+    if key in cache:
+        return cache[key]
+
+    metrics = compute_fn()
+    if metrics is not None:
+        cache[key] = metrics
+        _dirty = True
+    return metrics
@@ -9,13 +9,14 @@ from tempfile import NamedTemporaryFile
 Image.MAX_IMAGE_PIXELS = 200_000_000
 
 # ANSI color codes.
-GREEN = '\033[92m'
-RED = '\033[91m'
-YELLOW = '\033[93m'
-RESET = '\033[0m'
+_TTY = sys.stdout.isatty()  # Colors off when piped to a file.
+GREEN = '\033[92m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
 
 # Extensions.
-IMAGE_EXTS = [".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".png"]
+IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".png"})
 
 # Auxiliary Functions.
 
@@ -0,0 +1,23 @@
+"""
+Shared size-comparison arithmetic, so every script that reports
+original-vs-encoded sizes classifies them the same way.
+"""
+
+def compare_pair(size_orig, size_sec, margin):
+    """
+    Compares one original/secondary byte-size pair.
+    Returns (mb_orig, mb_sec, diff_mb, pct, bigger_than_margin),
+    with sizes in decimal megabytes.
+    """
+    mb_orig = size_orig / (1000 * 1000)
+    mb_sec = size_sec / (1000 * 1000)
+    diff_mb = mb_sec - mb_orig
+    pct = (diff_mb / mb_orig * 100) if mb_orig > 0 else 0
+    return (mb_orig, mb_sec, diff_mb, pct, pct >= margin)
+
+def compare_sizes(orig_sizes, sec_sizes, margin):
+    """
+    Vectorised form: takes two equal-length byte-size sequences and
+    returns a list of compare_pair tuples in one pass.
+    """
+    return [compare_pair(o, s, margin) for o, s in zip(orig_sizes, sec_sizes)]